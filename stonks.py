@@ -1,15 +1,209 @@
+import asyncio
+import concurrent.futures
+import calendar
+import httpx
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from datetime import datetime
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+from pyarrow import csv as pacsv
 import os
-from io import StringIO
-from typing import List, Optional
+import time
+import hashlib
+import tempfile
+from importlib.util import find_spec
+import re
+from io import BytesIO
+from urllib.parse import quote, urlencode
+from typing import BinaryIO, Callable, List, Optional, Sequence, Tuple
 import json
+from collections import OrderedDict
+from functools import lru_cache
+
+# Only advertise brotli when installed, since requests/httpx need it to decode "br" responses
+if find_spec("brotli") is not None:
+    _ACCEPT_ENCODING = "gzip, deflate, br"
+else:
+    _ACCEPT_ENCODING = "gzip, deflate"
+
+# httpx can only speak HTTP/2 with h2 installed (httpx[http2])
+_HTTP2 = find_spec("h2") is not None
 
 API_ENDPOINT = "https://www.alphavantage.co/query"
 API_KEY = os.environ.get("ALPHA_VANTAGE_API_KEY")
+REQUEST_TIMEOUT = (3.05, 30)
+CONCURRENCY_LIMIT = 5
+REQUEST_HEADERS = {"Accept-Encoding": _ACCEPT_ENCODING, "User-Agent": "stonks/1.0"}
+
+VALID_INTERVALS = frozenset({"1min", "5min", "15min", "30min", "60min"})
+VALID_TOPICS = frozenset({
+    "blockchain",
+    "earnings",
+    "ipo",
+    "mergers_and_acquisitions",
+    "financial_markets",
+    "economy_fiscal",
+    "economy_monetary",
+    "economy_macro",
+    "finance",
+    "life_sciences",
+    "manufacturing",
+    "real_estate",
+    "retail_wholesale",
+    "technology"
+})
+VALID_SORTS = frozenset({"EARLIEST", "LATEST", "RELEVANCE"})
+
+@lru_cache(maxsize=None)
+def _url_prefix(function: str, api_key: Optional[str]) -> str:
+    """
+    Fixed part of an endpoint's URL, so only the per-call parameters are formatted.
+    Callers pass the current API_KEY, so setting stonks.API_KEY after import still works.
+    """
+    return f"{API_ENDPOINT}?{urlencode({'function': function, 'apikey': api_key})}&"
+
+
+_MONTH_RE = re.compile(r"(0?[1-9]|1[0-2])/[0-9]{4}")
+_DAY_RE = re.compile(r"[0-9]{4}-[0-9]{1,2}-[0-9]{1,2}")
+
+# float32/int32 is plenty of precision for OHLC prices and per-bar volume
+STOCK_SCHEMA = pa.schema([
+    ("time", pa.timestamp("ns")),
+    ("open", pa.float32()),
+    ("high", pa.float32()),
+    ("low", pa.float32()),
+    ("close", pa.float32()),
+    ("volume", pa.int32())
+])
+
+CSV_CHUNK_SIZE = 1 << 20  # Bytes of CSV per block when parsing in low memory mode
+
+# Shared session so repeated calls reuse the keep-alive TLS connection
+_SESSION = requests.Session()
+_SESSION.headers.update(REQUEST_HEADERS)
+_SESSION.mount("https://", HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=16,
+    max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504])
+))
+
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "stonks")
+# Alpha Vantage slices are trailing 30-day windows counted back from today. Only slices that
+# end more than 30 days ago are settled history and get the long TTL; the most recent slice
+# (year1month1) still gains new bars, so it is only cached briefly.
+HISTORY_CACHE_TTL = 90 * 24 * 60 * 60
+RECENT_HISTORY_CACHE_TTL = 15 * 60
+SENTIMENT_CACHE_TTL = 15 * 60
+
 
-def get_stock_history(ticker: str, date: str, interval: str = "1min", after_hours: bool=False) -> pd.DataFrame:
+class FileCache:
+    """
+    On-disk cache for Alpha Vantage results. Parsed stock history is stored as a Parquet
+    dataset keyed on (ticker, interval, month); sentiment JSON is keyed on the request URL.
+
+    :param root: Directory to store cache entries in
+    """
+
+    def __init__(self, root: str = CACHE_DIR):
+        self.root = root
+
+    def _path(self, url: str, ext: str) -> str:
+        return os.path.join(self.root, hashlib.md5(url.encode("utf-8")).hexdigest() + ext)
+
+    def _write(self, path: str, write: Callable[[str], None]) -> None:
+        """
+        Write a cache entry via a temp file so readers never see a partial file.
+        Caching is best-effort, so failures (e.g. an unwritable cache dir) are ignored.
+        """
+        tmp_path = None
+        try:
+            os.makedirs(self.root, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+            os.close(fd)
+            write(tmp_path)
+            os.replace(tmp_path, path)
+        except (OSError, ValueError, pa.ArrowException):
+            if tmp_path is not None and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def get_df(self, key: str, ttl: float) -> Optional[pd.DataFrame]:
+        """
+        Get a cached dataframe by key, or None if missing, unreadable or older than ttl seconds.
+        """
+        path = os.path.join(self.root, key + ".parquet")
+        try:
+            if time.time() - os.path.getmtime(path) > ttl:
+                return None
+            return pd.read_parquet(path, engine="pyarrow")
+        except (OSError, ValueError, pa.ArrowException):
+            return None
+
+    def set_df(self, key: str, df: pd.DataFrame) -> None:
+        self._write(
+            os.path.join(self.root, key + ".parquet"),
+            lambda path: df.to_parquet(path, compression="zstd", index=True)
+        )
+
+    def get_json(self, url: str, ttl: float) -> Optional[dict]:
+        """
+        Get a cached JSON payload for a URL, or None if missing, unreadable or older than ttl seconds.
+        """
+        try:
+            with open(self._path(url, ".json")) as f:
+                entry = json.load(f)
+            if time.time() - entry["ts"] > ttl:
+                return None
+            return entry["payload"]
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def set_json(self, url: str, payload: dict) -> None:
+        def write(path: str) -> None:
+            with open(path, "w") as f:
+                json.dump({"ts": time.time(), "payload": payload}, f)
+
+        self._write(self._path(url, ".json"), write)
+
+
+class MemoryCache:
+    """
+    In-process LRU cache of recent results, so repeated calls skip URL building and disk reads.
+
+    :param maxsize: Maximum number of entries to keep
+    """
+
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+
+    def get(self, key: tuple) -> Optional[pd.DataFrame]:
+        """
+        Get a copy of a cached dataframe, or None if missing or expired.
+        """
+        entry = self._entries.get(key)
+        if entry is None or time.time() > entry[0]:
+            return None
+        self._entries.move_to_end(key)
+        # Hand out copies so callers can't mutate the cached frame
+        return entry[1].copy()
+
+    def set(self, key: tuple, df: pd.DataFrame, ttl: float) -> None:
+        """
+        Cache a copy of a dataframe for ttl seconds.
+        """
+        self._entries[key] = (time.time() + ttl, df.copy())
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+
+_CACHE = FileCache()
+_MEMO = MemoryCache()
+
+def get_stock_history(ticker: str, date: str, interval: str = "1min", after_hours: bool=False, force_refresh: bool=False, low_memory: bool=False) -> pd.DataFrame:
     """
     Get stock history for a given date using Alpha Vantage TIME_SERIES_INTRADAY_EXTENDED endpoint.
     
@@ -17,52 +211,149 @@ def get_stock_history(ticker: str, date: str, interval: str = "1min", after_hour
     :param date: Date in the form of "MM/YYYY"
     :param interval: Time interval between stock data points. Must be one of "1min", "5min", "15min", "30min", or "60min"
     :param after_hours: Whether to include after hours data
+    :param force_refresh: Whether to bypass the in-process and on-disk caches
+    :param low_memory: Whether to parse and filter the CSV in chunks instead of all at once.
+        Fetched slices aren't written to the on-disk cache in this mode, since after hours rows are dropped while parsing
     :return: Stock history dataframe in the form of:
         time, open, high, low, close, volume
         2021-01-04 20:00:00, 129.9900, 129.9900, 129.9900, 129.9900, 100
         ...
     """
+    memo_key = ("history", ticker, date, interval, after_hours)
+    if not force_refresh:
+        df = _MEMO.get(memo_key)
+        if df is not None:
+            return df
+
+    url, key, ttl = _stock_history_request(ticker, date, interval)
+    df = None if force_refresh else _CACHE.get_df(key, ttl)
+    if df is None:
+        # Stream the body so CSV parsing overlaps with the download
+        with _SESSION.get(url, stream=True, timeout=REQUEST_TIMEOUT) as response:
+            response.raise_for_status()
+            response.raw.decode_content = True  # Transparently decompress gzip/br
+            if low_memory:
+                df = _parse_stock_history_chunked(response.raw, after_hours)
+            else:
+                df = _parse_stock_history(response.raw)
+        if not low_memory:
+            _CACHE.set_df(key, df)
+            df = _filter_after_hours(df, after_hours)
+    else:
+        df = _filter_after_hours(df, after_hours)
+
+    _MEMO.set(memo_key, df, ttl)
+    return df
+
+def get_stock_history_many(queries: List[dict], force_refresh: bool = False) -> List[pd.DataFrame]:
+    """
+    Get stock history for many slices at once, fetching them concurrently.
+
+    :param queries: List of keyword arguments for get_stock_history, e.g.
+        [{"ticker": "AAPL", "date": "05/2023"}, {"ticker": "MSFT", "date": "05/2023", "interval": "5min"}]
+    :param force_refresh: Whether to bypass the on-disk cache
+    :return: List of stock history dataframes, in the same order as queries
+    """
+    history_requests = [_stock_history_request(q["ticker"], q["date"], q.get("interval", "1min")) for q in queries]
+    urls = [url for url, _, _ in history_requests]
+    keys = [key for _, key, _ in history_requests]
+    dfs = [None if force_refresh else _CACHE.get_df(key, ttl) for _, key, ttl in history_requests]
+
+    # Only hit the network for cache misses
+    missing = [i for i, df in enumerate(dfs) if df is None]
+    responses = _fetch_all_sync([urls[i] for i in missing])
+    for i, response in zip(missing, responses):
+        dfs[i] = _parse_stock_history(BytesIO(response.content))
+        _CACHE.set_df(keys[i], dfs[i])
+
+    results = []
+    for df, q, (_, _, ttl) in zip(dfs, queries, history_requests):
+        after_hours = q.get("after_hours", False)
+        df = _filter_after_hours(df, after_hours)
+        # Keep get_stock_history in sync, particularly after a force_refresh
+        _MEMO.set(("history", q["ticker"], q["date"], q.get("interval", "1min"), after_hours), df, ttl)
+        results.append(df)
+    return results
+
+def _stock_history_request(ticker: str, date: str, interval: str) -> Tuple[str, str, float]:
+    """
+    Validate stock history arguments and build the request URL, cache key and cache TTL.
+    """
     # Check if date is in the correct format
-    try:
-        date_obj = datetime.strptime(date, "%m/%Y")
-    except ValueError:
+    if not _MONTH_RE.fullmatch(date):
         raise ValueError("Date must be in the form of 'MM/YYYY'")
+    month, year = date.split("/")
+    date_obj = datetime(int(year), int(month), 1)
     
     # Check if interval is valid
-    if interval not in ["1min", "5min", "15min", "30min", "60min"]:
+    if interval not in VALID_INTERVALS:
         raise ValueError("Interval must be one of '1min', '5min', '15min', '30min', or '60min'")
 
-    function = "TIME_SERIES_INTRADAY_EXTENDED"
-    
     # Check if date is within the last 2 years and is not a future date
-    if date_obj > datetime.now() or date_obj < datetime.now().replace(year=datetime.now().year - 2):
+    now = datetime.now()
+    if date_obj > now or date_obj < now.replace(year=now.year - 2):
         raise ValueError("Date must be within the last 2 years and not a future date")
 
-    # Calculate year and month difference from current date
-    current_date = datetime.now()
-    year_diff = current_date.year - date_obj.year
-    month_diff = current_date.month - date_obj.month
+    # Calculate slice string from the month difference to the current date
+    slice_value = (now.year - date_obj.year) * 12 + now.month - date_obj.month
+    slice_year, slice_month = divmod(slice_value - 1, 12)
+    slice_str = f"year{slice_year + 1}month{slice_month + 1}"
 
-    # Calculate slice string
-    slice_value = (year_diff * 12) + month_diff
-    slice_year = (slice_value - 1) // 12 + 1
-    slice_month = (slice_value - 1) % 12 + 1
-    slice_str = f"year{slice_year}month{slice_month}"  
-    
-    # Make API request
-    url = f"{API_ENDPOINT}?function={function}&symbol={ticker}&interval={interval}&slice={slice_str}&apikey={API_KEY}"
-    response = requests.get(url)
-    content = response.content.decode("utf-8")
-    # Load data into dataframe
-    df =  pd.read_csv(StringIO(content))
+    url = _url_prefix("TIME_SERIES_INTRADAY_EXTENDED", API_KEY) + f"symbol={ticker}&interval={interval}&slice={slice_str}"
+    # Slices are relative to today, so key the cache on the calendar month they resolve to.
+    # The most recent slice overlaps live data, so it gets its own short-lived key; otherwise a
+    # file written while it was live would be read back as settled history once the month rolls over
+    key = f"{quote(ticker, safe='')}_{interval}_{date_obj:%Y%m}"
+    if slice_value > 1:
+        ttl = HISTORY_CACHE_TTL
+    else:
+        key += "_recent"
+        ttl = RECENT_HISTORY_CACHE_TTL
+    return url, key, ttl
+
+def _parse_stock_history(source: BinaryIO) -> pd.DataFrame:
+    """
+    Load a TIME_SERIES_INTRADAY_EXTENDED CSV response into a formatted dataframe.
+    """
+    # Parse straight into typed Arrow columns with the multithreaded reader
+    table = pacsv.read_csv(
+        source,
+        read_options=pacsv.ReadOptions(use_threads=True, block_size=1 << 20),
+        convert_options=pacsv.ConvertOptions(column_types=dict(zip(STOCK_SCHEMA.names, STOCK_SCHEMA.types)))
+    )
+    # split_blocks/self_destruct hand the Arrow buffers to pandas without consolidating copies
+    df = table.to_pandas(split_blocks=True, self_destruct=True)
+    df.set_index("time", inplace=True)
+    return df
+
+def _parse_stock_history_chunked(source: BinaryIO, after_hours: bool) -> pd.DataFrame:
+    """
+    Load a TIME_SERIES_INTRADAY_EXTENDED CSV response in CSV_CHUNK_SIZE blocks, filtering
+    each block before moving on so only the kept rows are held in memory.
+    """
+    reader = pacsv.open_csv(
+        source,
+        read_options=pacsv.ReadOptions(block_size=CSV_CHUNK_SIZE),
+        convert_options=pacsv.ConvertOptions(column_types=dict(zip(STOCK_SCHEMA.names, STOCK_SCHEMA.types)))
+    )
+    chunks = []
+    for batch in reader:
+        chunk = batch.to_pandas()
+        chunk.set_index("time", inplace=True)
+        chunks.append(_filter_after_hours(chunk, after_hours))
+
+    if not chunks:
+        return _filter_after_hours(STOCK_SCHEMA.empty_table().to_pandas().set_index("time"), after_hours)
+    return pd.concat(chunks)
 
-    # Convert columns to appropriate types
-    df = format_stock_df(df)
+MARKET_OPEN_MINUTE = 9 * 60 + 30
+MARKET_CLOSE_MINUTE = 16 * 60
 
-    # Filter out after hours data
+def _filter_after_hours(df: pd.DataFrame, after_hours: bool) -> pd.DataFrame:
+    # Filter out after hours data, equivalent to between_time("9:30", "16:00") for minute bars
     if not after_hours:
-        df = df.between_time("9:30", "16:00")
-    
+        minutes = df.index.hour.to_numpy(np.int16) * 60 + df.index.minute.to_numpy(np.int16)
+        df = df.iloc[(minutes >= MARKET_OPEN_MINUTE) & (minutes <= MARKET_CLOSE_MINUTE)]
     return df
 
 def format_stock_df (stock_df: pd.DataFrame) -> pd.DataFrame:
@@ -78,13 +369,14 @@ def format_stock_df (stock_df: pd.DataFrame) -> pd.DataFrame:
     return stock_df
 
 def get_stock_sentiment(
-    tickers: List[str] = [],
-    topics: List[str] = [],
+    tickers: Optional[Sequence[str]] = None,
+    topics: Optional[Sequence[str]] = None,
     time_from: Optional[str] = None,
     time_to: Optional[str] = None,
     sort: Optional[str] = None,
-    limit: int = 200
-) -> dict:
+    limit: int = 200,
+    force_refresh: bool = False
+) -> pd.DataFrame:
     """
     Get stock sentiment for a stock or topic using Alpha Vantage NEWS_SENTIMENT endpoint.
 
@@ -94,73 +386,172 @@ def get_stock_sentiment(
     :param limit: Number of results to return, max 200
     :param time_from: From date in the form of "YYYY-MM-DD"
     :param time_to: To date in the form of "YYYY-MM-DD"
-    :return: Sentiment JSON object
+    :param force_refresh: Whether to bypass the in-process and on-disk caches
+    :return: Sentiment dataframe with one row per news article
+    """
+    tickers = tuple(tickers or ())
+    topics = tuple(topics or ())
+
+    memo_key = _sentiment_memo_key(tickers, topics, time_from, time_to, sort, limit)
+    if not force_refresh:
+        df = _MEMO.get(memo_key)
+        if df is not None:
+            return df
+
+    url = _stock_sentiment_url(tickers, topics, time_from, time_to, sort, limit)
+    data = None if force_refresh else _CACHE.get_json(url, SENTIMENT_CACHE_TTL)
+    if data is None:
+        response = _SESSION.get(url, timeout=REQUEST_TIMEOUT)
+        response.raise_for_status()
+        data = response.json()
+        _cache_sentiment(url, data)
+
+    df = _parse_stock_sentiment(data)
+    _MEMO.set(memo_key, df, SENTIMENT_CACHE_TTL)
+    return df
+
+def get_stock_sentiment_many(queries: List[dict], force_refresh: bool = False) -> List[pd.DataFrame]:
+    """
+    Get stock sentiment for many queries at once, fetching them concurrently.
+
+    :param queries: List of keyword arguments for get_stock_sentiment, e.g.
+        [{"tickers": ["AAPL"]}, {"topics": ["earnings"], "time_from": "2023-05-01"}]
+    :param force_refresh: Whether to bypass the on-disk cache
+    :return: List of sentiment dataframes, in the same order as queries
+    """
+    urls = [_stock_sentiment_url(**q) for q in queries]
+    payloads = [None if force_refresh else _CACHE.get_json(url, SENTIMENT_CACHE_TTL) for url in urls]
+
+    # Only hit the network for cache misses
+    missing = [i for i, data in enumerate(payloads) if data is None]
+    responses = _fetch_all_sync([urls[i] for i in missing])
+    for i, response in zip(missing, responses):
+        payloads[i] = response.json()
+        _cache_sentiment(urls[i], payloads[i])
+
+    results = []
+    for data, q in zip(payloads, queries):
+        df = _parse_stock_sentiment(data)
+        # Keep get_stock_sentiment in sync, particularly after a force_refresh
+        _MEMO.set(_sentiment_memo_key(**q), df, SENTIMENT_CACHE_TTL)
+        results.append(df)
+    return results
+
+def _sentiment_memo_key(
+    tickers: Optional[Sequence[str]] = None,
+    topics: Optional[Sequence[str]] = None,
+    time_from: Optional[str] = None,
+    time_to: Optional[str] = None,
+    sort: Optional[str] = None,
+    limit: int = 200
+) -> tuple:
+    return ("sentiment", tuple(sorted(tickers or ())), tuple(sorted(topics or ())), time_from, time_to, sort, limit)
+
+def _stock_sentiment_url(
+    tickers: Optional[Sequence[str]] = None,
+    topics: Optional[Sequence[str]] = None,
+    time_from: Optional[str] = None,
+    time_to: Optional[str] = None,
+    sort: Optional[str] = None,
+    limit: int = 200
+) -> str:
+    """
+    Validate stock sentiment arguments and build the request URL.
     """
+    tickers = tuple(tickers or ())
+    topics = tuple(topics or ())
 
     if not tickers and not topics:
         raise ValueError("At least one ticker or topic must be provided")
 
-    VALID_TOPICS = {
-        "blockchain",
-        "earnings",
-        "ipo",
-        "mergers_and_acquisitions",
-        "financial_markets",
-        "economy_fiscal",
-        "economy_monetary",
-        "economy_macro",
-        "finance",
-        "life_sciences",
-        "manufacturing",
-        "real_estate",
-        "retail_wholesale",
-        "technology"
-    }
-
-    function = "NEWS_SENTIMENT"
-
     if topics:
-        if not set(topics).issubset(VALID_TOPICS):
-            raise ValueError(f"Topics must be in valid topics: {VALID_TOPICS}")
+        if not VALID_TOPICS.issuperset(topics):
+            raise ValueError(f"Topics must be in valid topics: {set(VALID_TOPICS)}")
 
-    if sort and sort not in ["EARLIEST", "LATEST", "RELEVANCE"]:
+    if sort and sort not in VALID_SORTS:
         raise ValueError("Sort must be 'EARLIEST', 'LATEST', or 'RELEVANCE'")
 
     if limit > 200:
         raise ValueError("Limit must be less than or equal to 200")
 
     if time_from:
-        time_from = datetime.strptime(time_from, "%Y-%m-%d").strftime("%Y%m%dT%H%M")
+        time_from = _api_datetime(time_from, "time_from")
 
     if time_to:
-        time_to = datetime.strptime(time_to, "%Y-%m-%d").strftime("%Y%m%dT%H%M")
-
-    topics_str = ",".join(topics)
-    tickers_str = ",".join(tickers)
+        time_to = _api_datetime(time_to, "time_to")
 
-    url = f"{API_ENDPOINT}?function={function}&apikey={API_KEY}"
+    params = {}
     if topics:
-        url += f"&topics={topics_str}"
+        params["topics"] = ",".join(topics)
 
     if tickers:
-        url += f"&tickers={tickers_str}"
+        params["tickers"] = ",".join(tickers)
 
     if sort:
-        url += f"&sort={sort}"
+        params["sort"] = sort
 
     if time_from:
-        url += f"&time_from={time_from}"
+        params["time_from"] = time_from
 
     if time_to:
-        url += f"&time_to={time_to}"
+        params["time_to"] = time_to
+
+    params["limit"] = limit
 
-    url += f"&limit={limit}"
+    url = _url_prefix("NEWS_SENTIMENT", API_KEY) + urlencode(params)
 
-    response = requests.get(url)
-    data = response.json()
+    return url
 
+def _api_datetime(value: str, name: str) -> str:
+    """
+    Convert a "YYYY-MM-DD" date into Alpha Vantage's "YYYYMMDDTHHMM" format.
+    """
+    if not _DAY_RE.fullmatch(value):
+        raise ValueError(f"{name} must be in the form of 'YYYY-MM-DD'")
+    year, month, day = (int(part) for part in value.split("-"))
+    if not 1 <= month <= 12 or not 1 <= day <= calendar.monthrange(year, month)[1]:
+        raise ValueError(f"{name} must be a valid date in the form of 'YYYY-MM-DD'")
+    return f"{year:04d}{month:02d}{day:02d}T0000"
+
+def _cache_sentiment(url: str, data: dict) -> None:
+    # Alpha Vantage reports errors in a 200 response, so only cache real results
+    if "feed" in data:
+        _CACHE.set_json(url, data)
+
+def _parse_stock_sentiment(data: dict) -> pd.DataFrame:
     # Flatten the JSON and create a DataFrame
     df = pd.json_normalize(data, "feed")
     df["time_published"] = pd.to_datetime(df["time_published"], format="%Y%m%dT%H%M%S")
 
     return df
+
+async def _fetch(client: httpx.AsyncClient, semaphore: asyncio.Semaphore, url: str) -> httpx.Response:
+    async with semaphore:
+        response = await client.get(url)
+    response.raise_for_status()
+    return response
+
+def _fetch_all_sync(urls: List[str]) -> List[httpx.Response]:
+    """
+    Run _fetch_all to completion from synchronous code. If an event loop is already
+    running in this thread (e.g. in Jupyter), run it on a worker thread instead.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(_fetch_all(urls))
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, _fetch_all(urls)).result()
+
+async def _fetch_all(urls: List[str]) -> List[httpx.Response]:
+    """
+    Fetch URLs concurrently, with at most CONCURRENCY_LIMIT requests in flight.
+    """
+    if not urls:
+        return []
+    semaphore = asyncio.Semaphore(CONCURRENCY_LIMIT)
+    # With HTTP/2, httpx multiplexes concurrent requests over one connection on its own;
+    # the pool only grows if the server falls back to HTTP/1.1
+    limits = httpx.Limits(max_keepalive_connections=8, max_connections=16)
+    async with httpx.AsyncClient(http2=_HTTP2, headers=REQUEST_HEADERS, limits=limits, timeout=30) as client:
+        return await asyncio.gather(*[_fetch(client, semaphore, url) for url in urls])